@@ -9,13 +9,22 @@ API_KEY = ""  # 请填写您的智谱AI API密钥
 PARQUET_FILE_PATH = "mdc_train_v1.parquet"  # 您的parquet数据集文件路径
 
 # 并发配置
-MAX_WORKERS = 5  # 最大并发线程数，建议根据API配额调整
+MAX_WORKERS = 50  # 最大并发请求数（异步），建议根据API配额调整
 BATCH_SIZE = 50  # 每批处理的数据量，可根据内存情况调整
 MAX_RETRIES = 5  # 最大重试次数
 
+# 限流配置（令牌桶），None表示不限制
+MAX_RPM = None  # 每分钟最大请求数，建议略低于API配额
+MAX_TPM = None  # 每分钟最大token数，建议略低于API配额
+
+# Batch API配置
+USE_BATCH_API = False  # 是否使用智谱Batch API异步批量提交（成本约减半，但结果可能需等待较长时间）
+BATCH_POLL_INTERVAL = 30  # Batch任务状态轮询的初始间隔（秒），之后指数增长
+MAX_BATCH_JOBS = 20  # 同时在途的Batch任务数（每个任务包含BATCH_SIZE条数据）
+
 # 输出配置
 TEMP_DIR = "temp_results_train"  # 临时结果存储目录
-FINAL_RESULTS_FILE = "final_analysis_results.json"  # 最终结果文件
+FINAL_RESULTS_FILE = "final_analysis_summary.json"  # 最终结果文件（摘要，明细见final_analysis_results.jsonl）
 LOG_FILE = "dataset_analysis.log"  # 日志文件
 
 # 模型配置
@@ -28,7 +37,7 @@ ENABLE_MISLABEL_ANALYSIS = False  # 是否让模型判断是否误标注；False
 ENABLE_ARTICLE_SUMMARY = False  # 是否在主分析流程中直接生成按文章聚合的提炼规律（推荐单独运行汇总）
 
 # 文章级归纳配置（用于解耦式调用）
-ARTICLE_SUMMARY_INPUT_FILE = "final_analysis_results.json"  # 默认为主流程输出
+ARTICLE_SUMMARY_INPUT_FILE = "final_analysis_summary.json"  # 默认为主流程输出（也可直接指定明细jsonl文件）
 ARTICLE_SUMMARY_OUTPUT_FILE = "article_summaries.json"      # 汇总输出文件名（将保存在TEMP_DIR下）
 
 # 恢复配置
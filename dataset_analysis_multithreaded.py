@@ -1,13 +1,22 @@
-import pandas as pd
-import json
 import os
+import re
+import json
+import asyncio
 import time
+import hashlib
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Tuple, Optional
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 import logging
+from collections import Counter
 from datetime import datetime
 import pickle
+import httpx
+import orjson
+import diskcache
+import pyarrow.parquet as pq
 from zai import ZhipuAiClient
 
 # 配置日志
@@ -21,34 +30,246 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 智谱AI接口地址
+ZHIPU_API_BASE = "https://open.bigmodel.cn/api/paas/v4"
+
+# parquet数据集必须包含的列
+REQUIRED_COLUMNS = ['target_dataset_id', 'article_id', 'aggregated_text', 'type']
+
+# 单条待处理数据: (行号, target_dataset_id, article_id, aggregated_text, type)
+DataItem = Tuple[int, str, str, str, str]
+
+# 批次结果分片文件名（每个批次一个追加写入的JSONL文件）
+BATCH_SHARD_PATTERN = re.compile(r'^batch_(\d+)\.jsonl$')
+
+# 续跑时并行读取分片文件的线程数
+SHARD_LOAD_WORKERS = 16
+
+# 熔断：窗口期内连续失败达到阈值后停止调用API并中止本次运行（可从检查点恢复）
+CIRCUIT_FAILURE_THRESHOLD = 20
+CIRCUIT_FAILURE_WINDOW = 30   # 秒
+
+# 每完成多少项输出一次进度日志
+PROGRESS_LOG_INTERVAL = 100
+
+# 模型响应中的```json代码块
+JSON_FENCE_PATTERN = re.compile(r'```json\s*(.*?)\s*```', re.DOTALL)
+
+# 从字符串指定位置原地解析JSON（raw_decode），避免为截取JSON片段复制子串
+JSON_DECODER = json.JSONDecoder()
+
+# 最终结果文件：逐条追加的明细JSONL与仅含摘要的JSON
+FINAL_RESULTS_JSONL_FILE = 'final_analysis_results.jsonl'
+FINAL_SUMMARY_FILE = 'final_analysis_summary.json'
+
+# 结果文件的orjson序列化选项（缩进输出，允许非字符串键）
+JSON_FILE_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+# JSONL单行序列化选项
+JSON_LINE_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+
+class CircuitOpenError(Exception):
+    """
+    熔断已打开：API持续失败（如密钥失效、服务中断），停止调用并中止运行
+    """
+
+
+def reraise_exceptions(results: List):
+    """
+    重新抛出gather(return_exceptions=True)结果中的异常
+    （普通异常已在各项目内部处理，这里实际只会遇到熔断异常）
+    """
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """
+    逐行读取JSONL文件，损坏的行逐行记录并跳过，不影响其后各行。
+    文件以缓冲方式追加写入，进程中断可能留下没有换行符的未写完末行，同样跳过。
+    """
+    with open(path, 'rb') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                if line.endswith(b'\n'):
+                    logger.error(f"跳过损坏的第 {line_no} 行 {path}: {e}")
+                    continue
+                logger.warning(f"跳过未写完的末行 {path}: {len(line)} 字节")
+                return
+            yield record
+
+
+def truncate_partial_line(path: str):
+    """
+    将追加写入的JSONL文件截断到最后一个换行符，丢弃进程中断留下的未写完末行，
+    避免继续追加时新内容与半行拼在一起
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        # 从文件尾部按块向前查找最后一个换行符
+        while end > 0:
+            start = max(0, end - (1 << 16))
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+            logger.warning(f"截断未写完的末行 {path}: {size - end} 字节")
+
+
+def write_json_atomic(path: str, data: Dict):
+    """
+    原子写入JSON文件：先写临时文件并fsync，再os.replace替换，进程中断也不会留下半截文件
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(data, option=JSON_FILE_OPTIONS))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SummaryAccumulator:
+    """
+    增量统计分析摘要，逐条累加结果，无需在内存中保留全部明细
+    """
+    def __init__(self):
+        self.total = 0
+        self.classification_dist = Counter()
+        self.pattern_analysis: Dict[str, List[str]] = {}
+        self.keyword_frequency = Counter()
+        self.correct_classifications = 0
+        self.incorrect_classifications = 0
+
+    def add(self, result: Dict):
+        self.total += 1
+        if 'error' in result:
+            return
+        
+        # 分类分布
+        orig_class = result.get('original_classification', 'unknown')
+        self.classification_dist[orig_class] += 1
+        
+        # 上下文规律
+        pattern = result.get('context_pattern', '')
+        if pattern:
+            self.pattern_analysis.setdefault(orig_class, []).append(pattern)
+        
+        # 关键词频率
+        self.keyword_frequency.update(result.get('supporting_keywords', ()))
+        
+        # 分类准确性
+        if result.get('is_correct_classification', True):
+            self.correct_classifications += 1
+        else:
+            self.incorrect_classifications += 1
+
+    def to_summary(self, enable_mislabel_analysis: bool) -> Dict:
+        if not self.total:
+            return {"error": "没有有效结果"}
+        
+        summary = {
+            'classification_distribution': dict(self.classification_dist),
+            'top_keywords': dict(self.keyword_frequency.most_common(20)),
+            'context_patterns_by_type': self.pattern_analysis
+        }
+        if enable_mislabel_analysis:
+            summary['accuracy_analysis'] = {
+                'total_analyzed': self.correct_classifications + self.incorrect_classifications,
+                'correct_classifications': self.correct_classifications,
+                'incorrect_classifications': self.incorrect_classifications
+            }
+        
+        return summary
+
+
 class DatasetAnalyzer:
-    def __init__(self, api_key: str, max_workers: int = 5, max_retries: int = 5, temperature: float = 0.1, max_len: int = 10000, output: str = "temp_results", enable_mislabel_analysis: bool = True, enable_article_summary: bool = False):
+    def __init__(self, api_key: str, max_workers: int = 50, max_retries: int = 5, temperature: float = 0.1, max_len: int = 10000, output: str = "temp_results", enable_mislabel_analysis: bool = True, enable_article_summary: bool = False, use_batch_api: bool = False, batch_poll_interval: int = 30, max_batch_jobs: int = 20, max_rpm: Optional[int] = None, max_tpm: Optional[int] = None):
         """
         初始化数据集分析器
         
         Args:
             api_key: ZhipuAI API密钥
-            max_workers: 最大并发线程数
+            max_workers: 最大并发请求数
             max_retries: 最大重试次数
+            use_batch_api: 是否使用智谱Batch API异步批量提交（成本约减半，适合无实时性要求的任务）
+            batch_poll_interval: Batch任务状态轮询的初始间隔（秒）
+            max_batch_jobs: 同时在途（已提交、待完成）的Batch任务数
+            max_rpm: 每分钟最大请求数，None表示不限制
+            max_tpm: 每分钟最大token数（按prompt长度估算），None表示不限制
         """
         self.api_key = api_key
         self.max_workers = max_workers
         self.max_retries = max_retries
-        self.client = ZhipuAiClient(api_key=api_key)
+        # SDK客户端（用于Batch API）复用HTTP/2长连接，避免每次调用重新握手
+        self.client = ZhipuAiClient(
+            api_key=api_key,
+            http_client=httpx.Client(
+                http2=True,
+                limits=self.connection_limits(),
+                timeout=httpx.Timeout(60.0, connect=10.0)
+            )
+        )
         self.temperature = temperature
         self.max_len = max_len
         self.enable_mislabel_analysis = enable_mislabel_analysis
         self.enable_article_summary = enable_article_summary
+        # 提示词构建函数按是否启用误标注分析在初始化时选定，每条数据不再判断分支
+        self.prompt_builder = (self.build_mislabel_analysis_prompt if enable_mislabel_analysis
+                               else self.build_type_analysis_prompt)
+        self.use_batch_api = use_batch_api
+        self.batch_poll_interval = batch_poll_interval
+        self.max_batch_jobs = max_batch_jobs
         
         # 创建临时文件目录
         self.temp_dir = output
         os.makedirs(self.temp_dir, exist_ok=True)
+
+        # 响应缓存：以完整请求体（模型、参数与prompt）的哈希为键，重复运行或重复文本时跳过API调用
+        self.cache = diskcache.Cache(f"{self.temp_dir}/response_cache")
         
         # 线程锁
         self.lock = threading.Lock()
+
+        # 已打开的批次分片文件: batch_id -> 文件句柄
+        self.shard_files: Dict[int, object] = {}
+
+        # 最终明细文件句柄与增量摘要（在analyze_dataset运行期间有效）
+        self.final_results_file = None
+        self.summary_accumulator = SummaryAccumulator()
+
+        # 已成功完成的 (batch_id, index)，跨运行去重，恢复时由_analyze_dataset扫描分片文件填充
+        self.completed_keys: set = set()
+
+        # 异步HTTP客户端与并发信号量（在事件循环内由http_session创建）
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+        # 令牌桶限流：按RPM/TPM持续补充容量，调用前主动等待，而不是触发429后再退避
+        self.max_rpm = max_rpm
+        self.max_tpm = max_tpm
+        self.available_request_capacity = float(max_rpm or 0)
+        self.available_token_capacity = float(max_tpm or 0)
+        self.last_capacity_update = time.monotonic()
+
+        # 熔断状态：API整体不可用时尽快中止，避免每个项目都白白走完全部重试退避
+        self._consecutive_failures = 0
+        self._first_failure_at = 0.0
+        self._circuit_open = False
         
         # 结果存储
-        self.completed_count = 0
+        # 完成计数：next()在GIL下是原子的，无需加锁
+        self._counter = itertools.count(1)
         self.failed_items = []
         
     def create_analysis_prompt(self, target_dataset_id: str, article_id: str, 
@@ -56,8 +277,14 @@ class DatasetAnalyzer:
         """
         创建分析提示词
         """
-        if self.enable_mislabel_analysis:
-            prompt = f"""
+        return self.prompt_builder(target_dataset_id, article_id, aggregated_text, type_label)
+
+    def build_mislabel_analysis_prompt(self, target_dataset_id: str, article_id: str,
+                                       aggregated_text: str, type_label: str) -> str:
+        """
+        分类分析提示词（含误标注判断）
+        """
+        return f"""
 作为数据集分类专家，请分析以下数据集引用的分类原因。
 
 数据集信息：
@@ -104,8 +331,13 @@ C) None - 不是数据集引用或不相关
     "confidence_score": 0.95
 }}
 """
-        else:
-            prompt = f"""
+
+    def build_type_analysis_prompt(self, target_dataset_id: str, article_id: str,
+                                   aggregated_text: str, type_label: str) -> str:
+        """
+        分类分析提示词（仅类型分析与规律总结）
+        """
+        return f"""
 作为数据集分类专家，请分析以下数据集引用的分类原因。
 
 数据集信息：
@@ -148,45 +380,187 @@ C) None - 不是数据集引用或不相关
     "context_pattern": "归纳的可复用的上下文规律，最好不针对具体某一个数据集"
 }}
 """
-        return prompt
         
-    def call_api_with_retry(self, prompt: str, item_id: str) -> Optional[Dict]:
+    def build_request_body(self, prompt: str) -> Dict:
+        """
+        构建chat.completions请求体（直接调用与Batch任务共用）
+        """
+        return {
+            "model": "glm-4.5",
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "thinking": {
+                "type": "enabled",
+            },
+            "stream": False,
+            "max_tokens": self.max_len,
+            "temperature": self.temperature  # 降低温度以获得更一致的结果
+        }
+
+    def parse_response_content(self, content: str) -> Dict:
+        """
+        从模型响应中提取并解析JSON，解析失败时抛出json.JSONDecodeError
+        （orjson.JSONDecodeError也是其子类）
+        """
+        # 提取JSON部分（如果响应包含其他文本）：直接从起始位置原地解析，不再切出子串
+        match = JSON_FENCE_PATTERN.search(content)
+        if match:
+            return JSON_DECODER.raw_decode(content, match.start(1))[0]
+
+        json_start = content.find('{')
+        if json_start != -1:
+            return JSON_DECODER.raw_decode(content, json_start)[0]
+
+        return orjson.loads(content)
+
+    def connection_limits(self) -> httpx.Limits:
+        """
+        连接池大小与并发数匹配，每个并发请求都保持一条可复用的长连接
+        """
+        return httpx.Limits(
+            max_keepalive_connections=self.max_workers,
+            max_connections=self.max_workers * 2
+        )
+
+    @asynccontextmanager
+    async def http_session(self):
+        """
+        在当前事件循环内创建异步HTTP客户端与并发信号量
+        """
+        self.semaphore = asyncio.Semaphore(self.max_workers)
+        self._consecutive_failures = 0
+        self._circuit_open = False
+        async with httpx.AsyncClient(
+            base_url=ZHIPU_API_BASE,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            http2=True,
+            limits=self.connection_limits(),
+            timeout=httpx.Timeout(300.0, connect=10.0)
+        ) as client:
+            self.http_client = client
+            try:
+                yield client
+            finally:
+                self.http_client = None
+                # 关闭响应缓存的数据库连接（diskcache下次访问时会自动重新打开）
+                self.cache.close()
+
+    def estimate_token_cost(self, prompt: str) -> int:
+        """
+        粗略估算一次请求消耗的token数（输入按4字符/token估算，加上最大输出长度）
+        """
+        return len(prompt) // 4 + self.max_len
+
+    async def wait_for_capacity(self, token_cost: int):
+        """
+        等待令牌桶中的请求与token容量足够后扣减
+        """
+        if not self.max_rpm and not self.max_tpm:
+            return
+        
+        # 单次请求的估算值超过TPM上限时按上限计，避免永远等待
+        if self.max_tpm:
+            token_cost = min(token_cost, self.max_tpm)
+        
+        while True:
+            now = time.monotonic()
+            elapsed = now - self.last_capacity_update
+            self.last_capacity_update = now
+            if self.max_rpm:
+                self.available_request_capacity = min(
+                    self.available_request_capacity + self.max_rpm * elapsed / 60.0, self.max_rpm
+                )
+            if self.max_tpm:
+                self.available_token_capacity = min(
+                    self.available_token_capacity + self.max_tpm * elapsed / 60.0, self.max_tpm
+                )
+            
+            has_request_capacity = not self.max_rpm or self.available_request_capacity >= 1
+            has_token_capacity = not self.max_tpm or self.available_token_capacity >= token_cost
+            if has_request_capacity and has_token_capacity:
+                if self.max_rpm:
+                    self.available_request_capacity -= 1
+                if self.max_tpm:
+                    self.available_token_capacity -= token_cost
+                return
+            
+            await asyncio.sleep(0.05)
+
+    def check_circuit(self):
+        """
+        熔断打开后不再发起新的API调用
+        """
+        if self._circuit_open:
+            raise CircuitOpenError("熔断已打开，停止调用API")
+
+    def record_api_failure(self):
+        """
+        记录一次API调用失败（不含JSON解析失败与429限流），窗口期内连续失败达到阈值时打开熔断
+        （所有协程在同一事件循环线程中运行，计数无需加锁）
+        """
+        if self._circuit_open:
+            return
+        now = time.monotonic()
+        if self._consecutive_failures == 0 or now - self._first_failure_at > CIRCUIT_FAILURE_WINDOW:
+            self._consecutive_failures = 0
+            self._first_failure_at = now
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+            self._circuit_open = True
+            logger.error(
+                f"{CIRCUIT_FAILURE_WINDOW}秒内连续失败 {self._consecutive_failures} 次，"
+                f"打开熔断：停止提交新任务并中止运行"
+            )
+
+    def record_api_success(self):
+        """
+        API调用成功时重置连续失败计数
+        """
+        self._consecutive_failures = 0
+
+    def response_cache_key(self, request_content: bytes) -> str:
+        """
+        响应缓存的键（直接调用与Batch任务共用）：对序列化后的完整请求体取哈希，
+        修改模型、temperature、max_tokens等参数后不会命中旧设置下的结果
+        """
+        return hashlib.blake2b(request_content, digest_size=16).hexdigest()
+
+    async def call_api_with_retry(self, prompt: str, item_id: str) -> Optional[Dict]:
         """
         带重试机制的API调用
         """
+        request_content = orjson.dumps(self.build_request_body(prompt))
+        cache_key = self.response_cache_key(request_content)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"命中缓存 {item_id}")
+            return cached
+
+        token_cost = self.estimate_token_cost(prompt)
         for attempt in range(self.max_retries):
             try:
-                response = self.client.chat.completions.create(
-                    model="glm-4.5",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    thinking={
-                        "type": "enabled",
-                    },
-                    stream=False,
-                    max_tokens=self.max_len,
-                    temperature=self.temperature  # 降低温度以获得更一致的结果
-                )
+                self.check_circuit()
+                async with self.semaphore:
+                    # 排队期间熔断可能已打开
+                    self.check_circuit()
+                    await self.wait_for_capacity(token_cost)
+                    response = await self.http_client.post(
+                        "/chat/completions", content=request_content
+                    )
+                response.raise_for_status()
+                self.record_api_success()
                 
-                content = response.choices[0].message.content
+                content = orjson.loads(response.content)['choices'][0]['message']['content']
                 
                 # 尝试解析JSON响应
                 try:
-                    # 提取JSON部分（如果响应包含其他文本）
-                    if '```json' in content:
-                        json_start = content.find('```json') + 7
-                        json_end = content.find('```', json_start)
-                        json_content = content[json_start:json_end].strip()
-                    elif '{' in content and '}' in content:
-                        json_start = content.find('{')
-                        json_end = content.rfind('}') + 1
-                        json_content = content[json_start:json_end]
-                    else:
-                        json_content = content
-                    
-                    result = json.loads(json_content)
-                    logger.info(f"成功处理项目 {item_id}, 尝试次数: {attempt + 1}")
+                    result = self.parse_response_content(content)
+                    logger.debug(f"成功处理项目 {item_id}, 尝试次数: {attempt + 1}")
+                    self.cache[cache_key] = result
                     return result
                     
                 except json.JSONDecodeError as e:
@@ -199,10 +573,18 @@ C) None - 不是数据集引用或不相关
                             "item_id": item_id
                         }
                     
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 logger.error(f"API调用失败 {item_id}, 尝试次数 {attempt + 1}: {e}")
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+                    # 被限流：清空当前容量，让其他任务随令牌补充自然放缓，仅本任务退避（不计入熔断）
+                    self.available_request_capacity = 0.0
+                    self.available_token_capacity = 0.0
+                else:
+                    self.record_api_failure()
                 if attempt < self.max_retries - 1:
-                    time.sleep(2 ** attempt)  # 指数退避
+                    await asyncio.sleep(2 ** attempt)  # 指数退避
                 else:
                     return {
                         "error": str(e),
@@ -211,111 +593,545 @@ C) None - 不是数据集引用或不相关
         
         return None
     
-    def save_intermediate_result(self, result: Dict, batch_id: int, item_index: int):
+    def save_intermediate_result(self, result: Dict, batch_id: int):
         """
-        保存中间结果到临时文件
+        将中间结果追加写入批次分片文件 batch_{batch_id}.jsonl
         """
-        filename = f"{self.temp_dir}/batch_{batch_id}_item_{item_index}.json"
+        filename = f"{self.temp_dir}/batch_{batch_id}.jsonl"
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            with self.lock:
+                f = self.shard_files.get(batch_id)
+                if f is None:
+                    truncate_partial_line(filename)
+                    f = open(filename, 'ab', buffering=1 << 20)
+                    self.shard_files[batch_id] = f
+                f.write(orjson.dumps(result, option=JSON_LINE_OPTIONS))
         except Exception as e:
             logger.error(f"保存中间结果失败 {filename}: {e}")
+
+    def close_batch_shard(self, batch_id: int):
+        """
+        批次完成后关闭分片文件，将缓冲写入磁盘
+        """
+        with self.lock:
+            f = self.shard_files.pop(batch_id, None)
+        if f is not None:
+            f.close()
     
-    def process_single_item(self, item: Tuple[int, pd.Series], batch_id: int) -> Optional[Dict]:
+    async def process_single_item(self, item: DataItem, batch_id: int) -> Optional[Dict]:
         """
         处理单个数据项
         """
-        index, row = item
+        index, target_dataset_id, article_id, aggregated_text, type_label = item
+        
+        # 之前的运行中已完成，结果已在分片文件中
+        if (batch_id, index) in self.completed_keys:
+            return None
         
         try:
             prompt = self.create_analysis_prompt(
-                target_dataset_id=str(row['target_dataset_id']),
-                article_id=str(row['article_id']),
-                aggregated_text=str(row['aggregated_text']),
-                type_label=str(row['type'])
+                target_dataset_id=target_dataset_id,
+                article_id=article_id,
+                aggregated_text=aggregated_text,
+                type_label=type_label
             )
             
-            result = self.call_api_with_retry(prompt, f"{batch_id}_{index}")
+            result = await self.call_api_with_retry(prompt, f"{batch_id}_{index}")
             
             if result:
                 # 添加原始数据信息
                 result['original_data'] = {
                     'index': index,
-                    'target_dataset_id': str(row['target_dataset_id']),
-                    'article_id': str(row['article_id']),
-                    'type': str(row['type'])
+                    'target_dataset_id': target_dataset_id,
+                    'article_id': article_id,
+                    'type': type_label
                 }
                 
                 # 保存中间结果
-                self.save_intermediate_result(result, batch_id, index)
+                self.save_intermediate_result(result, batch_id)
                 
-                with self.lock:
-                    self.completed_count += 1
-                    logger.info(f"已完成: {self.completed_count} 项")
+                self.record_completion()
                 
                 return result
             
+        except CircuitOpenError:
+            # 熔断中止：项目未完成，不写入分片也不计入失败，恢复时重新处理
+            raise
         except Exception as e:
             logger.error(f"处理项目失败 {batch_id}_{index}: {e}")
-            with self.lock:
-                self.failed_items.append({'batch_id': batch_id, 'index': index, 'error': str(e)})
+            self.record_failed_item({'batch_id': batch_id, 'index': index, 'error': str(e)})
         
         return None
     
-    def process_batch(self, data_batch: pd.DataFrame, batch_id: int) -> List[Dict]:
+    def record_completion(self):
+        """
+        完成计数加一，每PROGRESS_LOG_INTERVAL项输出一次进度
+        """
+        n = next(self._counter)
+        if n % PROGRESS_LOG_INTERVAL == 0:
+            logger.info(f"已完成: {n} 项")
+
+    def record_failed_item(self, failed_item: Dict):
+        """
+        记录失败项目，并追加写入failed_items.jsonl
+        """
+        filename = f"{self.temp_dir}/failed_items.jsonl"
+        with self.lock:
+            self.failed_items.append(failed_item)
+            try:
+                with open(filename, 'ab') as f:
+                    f.write(orjson.dumps(failed_item, option=JSON_LINE_OPTIONS))
+            except Exception as e:
+                logger.error(f"保存失败项目失败 {filename}: {e}")
+
+    def submit_batch_job(self, data_batch: List[DataItem], request_bodies: Dict[int, Dict], batch_id: int) -> str:
+        """
+        将批次数据序列化为JSONL并提交为Batch任务，返回任务ID
+        request_bodies: 行号 -> 已构建的请求体
+        """
+        requests_file = f"{self.temp_dir}/batch_{batch_id}_requests.jsonl"
+        with open(requests_file, 'wb') as f:
+            for item in data_batch:
+                index = item[0]
+                request = {
+                    "custom_id": f"{batch_id}_{index}",
+                    "method": "POST",
+                    "url": "/v4/chat/completions",
+                    "body": request_bodies[index]
+                }
+                f.write(orjson.dumps(request, option=JSON_LINE_OPTIONS))
+
+        with open(requests_file, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+
+        batch_job = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v4/chat/completions",
+            completion_window="24h",
+            metadata={"description": f"dataset analysis batch {batch_id}"}
+        )
+        logger.info(f"批次 {batch_id} 已提交Batch任务: {batch_job.id}")
+        return batch_job.id
+
+    async def wait_for_batch_job(self, job_id: str, max_interval: int = 600):
+        """
+        轮询Batch任务直到结束，轮询间隔指数增长
+        """
+        interval = self.batch_poll_interval
+        while True:
+            batch_job = await asyncio.to_thread(self.client.batches.retrieve, job_id)
+            if batch_job.status in ('completed', 'failed', 'expired', 'cancelled'):
+                logger.info(f"Batch任务 {job_id} 结束, 状态: {batch_job.status}")
+                return batch_job
+            logger.info(f"Batch任务 {job_id} 状态: {batch_job.status}, {interval} 秒后重试")
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+    def collect_batch_job_results(self, batch_job) -> Dict[str, Dict]:
+        """
+        下载Batch任务输出文件并解析，返回 custom_id -> 解析后的结果
+        """
+        parsed: Dict[str, Dict] = {}
+        if not getattr(batch_job, 'output_file_id', None):
+            return parsed
+
+        content = self.client.files.content(batch_job.output_file_id).content
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+                custom_id = record['custom_id']
+                response = record.get('response') or {}
+                if response.get('status_code') != 200:
+                    logger.warning(f"Batch请求失败 {custom_id}: {response.get('status_code')}")
+                    continue
+                message_content = response['body']['choices'][0]['message']['content']
+                parsed[custom_id] = self.parse_response_content(message_content)
+            except (json.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+                logger.warning(f"解析Batch输出行失败: {e}")
+        return parsed
+
+    async def process_batch_via_batch_api(self, data_batch: List[DataItem], batch_id: int) -> List[Dict]:
+        """
+        通过Batch API处理数据批次，已缓存的项目直接使用缓存，失败的custom_id回退到单条调用重试
+        """
+        results = []
+        pending_items = []
+        request_bodies: Dict[int, Dict] = {}
+        for item in data_batch:
+            index, target_dataset_id, article_id, aggregated_text, type_label = item
+            if (batch_id, index) in self.completed_keys:
+                continue
+            prompt = self.create_analysis_prompt(
+                target_dataset_id=target_dataset_id,
+                article_id=article_id,
+                aggregated_text=aggregated_text,
+                type_label=type_label
+            )
+            request_body = self.build_request_body(prompt)
+            cached = self.cache.get(self.response_cache_key(orjson.dumps(request_body)))
+            if cached is not None:
+                self.save_batch_api_result(cached, item, batch_id)
+                results.append(cached)
+                continue
+            request_bodies[index] = request_body
+            pending_items.append(item)
+        if not pending_items:
+            return results
+        
+        try:
+            job_id = await asyncio.to_thread(self.submit_batch_job, pending_items, request_bodies, batch_id)
+            batch_job = await self.wait_for_batch_job(job_id)
+            parsed = await asyncio.to_thread(self.collect_batch_job_results, batch_job)
+        except Exception as e:
+            logger.error(f"Batch任务处理失败 {batch_id}, 回退到单条调用: {e}")
+            parsed = {}
+
+        retry_items = []
+        for item in pending_items:
+            index = item[0]
+            result = parsed.get(f"{batch_id}_{index}")
+            if result is None:
+                retry_items.append(item)
+                continue
+
+            self.cache[self.response_cache_key(orjson.dumps(request_bodies[index]))] = result
+            self.save_batch_api_result(result, item, batch_id)
+            results.append(result)
+
+        # Batch中失败的项目回退到单条调用重试
+        if retry_items:
+            logger.info(f"批次 {batch_id} 有 {len(retry_items)} 项需单条重试")
+            retry_results = await asyncio.gather(
+                *(self.process_single_item(item, batch_id) for item in retry_items),
+                return_exceptions=True
+            )
+            reraise_exceptions(retry_results)
+            results.extend(result for result in retry_results if result)
+
+        logger.info(f"批次 {batch_id} 完成(Batch API), 成功处理 {len(results)} 项")
+        return results
+
+    def save_batch_api_result(self, result: Dict, item: DataItem, batch_id: int):
+        """
+        为Batch API（或缓存）得到的结果补充原始数据信息并写入分片文件
+        """
+        index, target_dataset_id, article_id, _, type_label = item
+        result['original_data'] = {
+            'index': index,
+            'target_dataset_id': target_dataset_id,
+            'article_id': article_id,
+            'type': type_label
+        }
+        self.save_intermediate_result(result, batch_id)
+        self.record_completion()
+
+    async def process_batch(self, data_batch: List[DataItem], batch_id: int) -> List[Dict]:
         """
         处理数据批次
         """
         logger.info(f"开始处理批次 {batch_id}, 包含 {len(data_batch)} 项")
+
+        try:
+            if self.use_batch_api:
+                await self.process_batch_via_batch_api(data_batch, batch_id)
+            else:
+                # 并发数由self.semaphore统一限制
+                item_results = await asyncio.gather(
+                    *(self.process_single_item(item, batch_id) for item in data_batch),
+                    return_exceptions=True
+                )
+                reraise_exceptions(item_results)
+        finally:
+            self.close_batch_shard(batch_id)
         
-        results = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有任务
-            future_to_item = {
-                executor.submit(self.process_single_item, item, batch_id): item 
-                for item in data_batch.iterrows()
-            }
-            
-            # 收集结果
-            for future in as_completed(future_to_item):
-                result = future.result()
-                if result:
-                    results.append(result)
+        # 以分片文件为准，包含之前运行中已完成而被跳过的项目
+        results = self.read_batch_shard(batch_id)
         
         logger.info(f"批次 {batch_id} 完成, 成功处理 {len(results)} 项")
         return results
     
-    def save_batch_results(self, results: List[Dict], batch_id: int):
+    def read_batch_shard(self, batch_id: int) -> List[Dict]:
+        """
+        读取批次分片文件，同一行号保留最后写入的结果
+        """
+        filename = f"{self.temp_dir}/batch_{batch_id}.jsonl"
+        if not os.path.exists(filename):
+            return []
+        
+        results_by_index: Dict[int, Dict] = {}
+        for result in iter_jsonl(filename):
+            results_by_index[(result.get('original_data') or {}).get('index')] = result
+        return list(results_by_index.values())
+
+    def list_batch_shards(self) -> List[Tuple[int, str]]:
+        """
+        列出临时目录中的批次分片文件，返回 (batch_id, 文件路径)
+        """
+        shards = []
+        for filename in os.listdir(self.temp_dir):
+            match = BATCH_SHARD_PATTERN.match(filename)
+            if match:
+                shards.append((int(match.group(1)), os.path.join(self.temp_dir, filename)))
+        return shards
+
+    def load_shard_completed_indices(self, path: str) -> set:
         """
-        保存批次结果
+        流式扫描单个分片文件，只保留已成功完成（非错误结果）的行号；
+        损坏的行由iter_jsonl逐行跳过，文件无法读取时记录错误
         """
-        filename = f"{self.temp_dir}/batch_{batch_id}_results.json"
+        indices = set()
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            logger.info(f"批次 {batch_id} 结果已保存到 {filename}")
-        except Exception as e:
-            logger.error(f"保存批次结果失败 {filename}: {e}")
-    
-    def load_existing_results(self) -> List[Dict]:
+            for result in iter_jsonl(path):
+                index = (result.get('original_data') or {}).get('index')
+                if index is not None and 'error' not in result:
+                    indices.add(index)
+        except OSError as e:
+            logger.error(f"加载结果文件失败 {path}: {e}")
+        return indices
+
+    def load_shard_files(self, paths: List[str]) -> List[set]:
         """
-        加载现有的中间结果
+        用线程池并行扫描多个分片文件（冷缓存/网络文件系统上逐个读取的延迟会主导续跑启动时间），
+        返回各文件已完成的行号集合，顺序与paths一致
         """
-        all_results = []
+        if not paths:
+            return []
+        with ThreadPoolExecutor(max_workers=min(SHARD_LOAD_WORKERS, len(paths))) as executor:
+            return list(executor.map(self.load_shard_completed_indices, paths))
+
+    def load_completed_keys(self) -> set:
+        """
+        扫描批次分片文件，收集已成功完成（非错误结果）的 (batch_id, index)；
+        只在内存中保留键，不保留结果本身
+        """
+        shards = self.list_batch_shards()
+        shard_indices = self.load_shard_files([path for _, path in shards])
+
+        completed_keys = set()
+        for (batch_id, _), indices in zip(shards, shard_indices):
+            completed_keys.update((batch_id, index) for index in indices)
+        return completed_keys
+
+    def reset_batch_shards(self):
+        """
+        全新运行时删除上次遗留的批次分片文件并清空去重索引
+        """
+        for _, path in self.list_batch_shards():
+            os.remove(path)
+        self.completed_keys = set()
+
+    def save_checkpoint(self, last_completed_batch: int, total_completed: int):
+        """
+        保存检查点（只记录计数与批次号，失败项目明细见failed_items.jsonl）
+        """
+        checkpoint = {
+            'last_completed_batch': last_completed_batch,
+            'total_completed': total_completed,
+            'total_failed': len(self.failed_items),
+            'timestamp': datetime.now().isoformat()
+        }
         
-        for filename in os.listdir(self.temp_dir):
-            if filename.endswith('_results.json'):
-                try:
-                    with open(os.path.join(self.temp_dir, filename), 'r', encoding='utf-8') as f:
-                        batch_results = json.load(f)
-                        all_results.extend(batch_results)
-                        logger.info(f"加载现有结果: {filename}, {len(batch_results)} 项")
-                except Exception as e:
-                    logger.error(f"加载结果文件失败 {filename}: {e}")
-        
-        return all_results
-    
+        write_json_atomic(f"{self.temp_dir}/checkpoint.json", checkpoint)
+
+    def iter_data_batches(self, parquet: pq.ParquetFile, batch_size: int,
+                          start_from_batch: int = 0) -> Iterator[Tuple[int, List[DataItem]]]:
+        """
+        按批次流式读取parquet，产出 (批次编号, [DataItem, ...])。
+        只解码必要的列，内存占用与batch_size成正比；恢复时跳过的行组不会被解码。
+        按列整体转换为字符串后直接组合成元组，不为每一行构建dict。
+        """
+        skip_rows = start_from_batch * batch_size
+        row_groups = []
+        for i in range(parquet.num_row_groups):
+            num_rows = parquet.metadata.row_group(i).num_rows
+            if skip_rows >= num_rows and not row_groups:
+                skip_rows -= num_rows
+                continue
+            row_groups.append(i)
+        if not row_groups:
+            return
+        
+        batch_num = start_from_batch
+        buffer: List[Tuple[str, str, str, str]] = []
+        for record_batch in parquet.iter_batches(batch_size=batch_size, row_groups=row_groups,
+                                                 columns=REQUIRED_COLUMNS):
+            columns = [list(map(str, record_batch.column(name).to_pylist())) for name in REQUIRED_COLUMNS]
+            rows = list(zip(*columns))
+            if skip_rows:
+                # 丢弃首个行组中属于已完成批次的行
+                dropped = min(skip_rows, len(rows))
+                rows = rows[dropped:]
+                skip_rows -= dropped
+            buffer.extend(rows)
+            
+            # iter_batches不跨行组拼接，这里重新切分以保证批次边界稳定
+            while len(buffer) >= batch_size:
+                start_idx = batch_num * batch_size
+                yield batch_num, [(index, *row) for index, row in enumerate(buffer[:batch_size], start_idx)]
+                buffer = buffer[batch_size:]
+                batch_num += 1
+        
+        if buffer:
+            yield batch_num, [(index, *row) for index, row in enumerate(buffer, batch_num * batch_size)]
+
+    async def process_batches_pipelined(self, batches: Iterator[Tuple[int, List[DataItem]]],
+                                        start_from_batch: int, total_batches: int):
+        """
+        在同一事件循环中流水线式处理所有批次，批次之间不再相互等待。
+        批次编号仅用于结果文件命名与检查点。
+        """
+        max_in_flight = self.max_workers * 4  # 限制在途任务数量以控制内存
+        remaining: Dict[int, int] = {}
+        finished_batches = set()
+        last_completed_batch = start_from_batch - 1
+        
+        def handle_done(task: asyncio.Task, batch_num: int):
+            nonlocal last_completed_batch
+            if isinstance(task.exception(), CircuitOpenError):
+                # 熔断中止的项目未完成，所在批次不再计入完成，检查点停在之前的连续批次
+                return
+            task.result()
+            remaining[batch_num] -= 1
+            if remaining[batch_num] > 0:
+                return
+            
+            # 批次全部完成：以分片文件为准，包含之前运行中已完成而被跳过的项目
+            del remaining[batch_num]
+            self.close_batch_shard(batch_num)
+            results = self.read_batch_shard(batch_num)
+            logger.info(f"批次 {batch_num} 完成, 成功处理 {len(results)} 项")
+            self.record_batch_results(results)
+            finished_batches.add(batch_num)
+            last_completed_batch = self.advance_checkpoint(finished_batches, last_completed_batch)
+        
+        task_to_batch: Dict[asyncio.Task, int] = {}
+        
+        async def drain_first_completed():
+            done, _ = await asyncio.wait(task_to_batch, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                handle_done(task, task_to_batch.pop(task))
+        
+        for batch_num, batch_data in batches:
+            if self._circuit_open:
+                break
+            logger.info(f"提交批次 {batch_num + 1}/{total_batches} (行 {batch_data[0][0]}-{batch_data[-1][0] + 1})")
+            remaining[batch_num] = len(batch_data)
+            
+            for item in batch_data:
+                if len(task_to_batch) >= max_in_flight:
+                    await drain_first_completed()
+                if self._circuit_open:
+                    # 熔断后不再创建新任务，该批次不会被视为完成
+                    break
+                task = asyncio.create_task(self.process_single_item(item, batch_num))
+                task_to_batch[task] = batch_num
+        
+        # 收集剩余结果（熔断后在途项目会在下一次调用前直接中止）
+        while task_to_batch:
+            await drain_first_completed()
+        
+        if self._circuit_open:
+            raise CircuitOpenError(self.circuit_abort_message(last_completed_batch))
+
+    async def process_batches_via_batch_api(self, batches: Iterator[Tuple[int, List[DataItem]]],
+                                            start_from_batch: int, total_batches: int):
+        """
+        以批次为单位提交Batch任务，最多max_batch_jobs个任务同时在途并一起轮询，
+        避免逐个等待任务完成（单个任务可能需要数小时）
+        """
+        finished_batches = set()
+        last_completed_batch = start_from_batch - 1
+        task_to_batch: Dict[asyncio.Task, int] = {}
+        
+        async def drain_first_completed():
+            nonlocal last_completed_batch
+            done, _ = await asyncio.wait(task_to_batch, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                batch_num = task_to_batch.pop(task)
+                if isinstance(task.exception(), CircuitOpenError):
+                    continue
+                results = task.result()
+                self.record_batch_results(results)
+                finished_batches.add(batch_num)
+            last_completed_batch = self.advance_checkpoint(finished_batches, last_completed_batch)
+        
+        for batch_num, batch_data in batches:
+            if len(task_to_batch) >= self.max_batch_jobs:
+                await drain_first_completed()
+            if self._circuit_open:
+                break
+            logger.info(f"提交批次 {batch_num + 1}/{total_batches} (行 {batch_data[0][0]}-{batch_data[-1][0] + 1})")
+            task = asyncio.create_task(self.process_batch(batch_data, batch_num))
+            task_to_batch[task] = batch_num
+        
+        if self._circuit_open:
+            # 熔断后不再等待其余Batch任务（可能需数小时），这些批次恢复时重新处理
+            for task in task_to_batch:
+                task.cancel()
+            await asyncio.gather(*task_to_batch, return_exceptions=True)
+            raise CircuitOpenError(self.circuit_abort_message(last_completed_batch))
+        
+        while task_to_batch:
+            await drain_first_completed()
+        
+        if self._circuit_open:
+            raise CircuitOpenError(self.circuit_abort_message(last_completed_batch))
+
+    def circuit_abort_message(self, last_completed_batch: int) -> str:
+        """
+        熔断中止运行时给出的错误信息，提示从检查点恢复
+        """
+        return (
+            f"API在{CIRCUIT_FAILURE_WINDOW}秒内连续失败{CIRCUIT_FAILURE_THRESHOLD}次，已熔断中止运行。"
+            f"检查点停在批次 {last_completed_batch}，排查API问题（密钥、网络、服务状态）后"
+            f"从批次 {last_completed_batch + 1} 恢复即可"
+        )
+
+    def advance_checkpoint(self, finished_batches: set, last_completed_batch: int) -> int:
+        """
+        检查点只记录连续完成的批次，保证恢复时不遗漏；返回新的最后连续完成批次
+        """
+        advanced = False
+        while last_completed_batch + 1 in finished_batches:
+            last_completed_batch += 1
+            finished_batches.remove(last_completed_batch)
+            advanced = True
+        if advanced:
+            self.save_checkpoint(last_completed_batch, self.summary_accumulator.total)
+        return last_completed_batch
+
+    def open_final_results_file(self, start_from_batch: int, batch_size: int):
+        """
+        打开最终明细JSONL并重建增量摘要。
+        恢复时只保留已完成批次之前的结果（流式过滤），避免重复处理的批次产生重复明细；
+        中断时未写完的末行在过滤时被丢弃，重写后的文件可以安全地继续追加。
+        """
+        self.summary_accumulator = SummaryAccumulator()
+        if start_from_batch == 0 or not os.path.exists(FINAL_RESULTS_JSONL_FILE):
+            return open(FINAL_RESULTS_JSONL_FILE, 'wb', buffering=1 << 20)
+        
+        first_pending_index = start_from_batch * batch_size
+        tmp_file = f"{FINAL_RESULTS_JSONL_FILE}.tmp"
+        with open(tmp_file, 'wb') as f:
+            for result in iter_jsonl(FINAL_RESULTS_JSONL_FILE):
+                if (result.get('original_data') or {}).get('index', 0) < first_pending_index:
+                    f.write(orjson.dumps(result, option=JSON_LINE_OPTIONS))
+                    self.summary_accumulator.add(result)
+        os.replace(tmp_file, FINAL_RESULTS_JSONL_FILE)
+        logger.info(f"加载了 {self.summary_accumulator.total} 个现有结果")
+        return open(FINAL_RESULTS_JSONL_FILE, 'ab', buffering=1 << 20)
+
+    def record_batch_results(self, results: List[Dict]):
+        """
+        将已完成批次的结果追加到最终明细文件并累加摘要，随后即可释放
+        """
+        for result in results:
+            self.final_results_file.write(orjson.dumps(result, option=JSON_LINE_OPTIONS))
+            self.summary_accumulator.add(result)
+        self.final_results_file.flush()
+
     def analyze_dataset(self, parquet_file: str, batch_size: int = 50, 
                        start_from_batch: int = 0) -> Dict:
         """
@@ -326,84 +1142,95 @@ C) None - 不是数据集引用或不相关
             batch_size: 每批处理的数据量
             start_from_batch: 从哪个批次开始（用于恢复中断的任务）
         """
+        return asyncio.run(self.analyze_dataset_async(parquet_file, batch_size, start_from_batch))
+
+    async def analyze_dataset_async(self, parquet_file: str, batch_size: int = 50,
+                                    start_from_batch: int = 0) -> Dict:
+        """
+        analyze_dataset的异步实现，可在已有事件循环中直接await
+        """
+        async with self.http_session():
+            try:
+                return await self._analyze_dataset(parquet_file, batch_size, start_from_batch)
+            finally:
+                for batch_id in list(self.shard_files):
+                    self.close_batch_shard(batch_id)
+
+    async def _analyze_dataset(self, parquet_file: str, batch_size: int,
+                               start_from_batch: int) -> Dict:
         logger.info(f"开始分析数据集: {parquet_file}")
         
-        # 读取数据
+        # 打开数据文件（按批次流式读取，不一次性载入内存）
         try:
-            df = pd.read_parquet(parquet_file)
-            logger.info(f"成功读取数据集，共 {len(df)} 行")
+            parquet = pq.ParquetFile(parquet_file)
+            total_rows = parquet.metadata.num_rows
+            logger.info(f"成功读取数据集，共 {total_rows} 行")
         except Exception as e:
             logger.error(f"读取parquet文件失败: {e}")
             return {"error": f"读取文件失败: {e}"}
         
         # 验证必要的列
-        required_columns = ['target_dataset_id', 'article_id', 'aggregated_text', 'type']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        column_names = parquet.schema_arrow.names
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in column_names]
         if missing_columns:
             error_msg = f"缺少必要的列: {missing_columns}"
             logger.error(error_msg)
             return {"error": error_msg}
         
-        # 如果从中间开始，加载现有结果
-        if start_from_batch > 0:
-            existing_results = self.load_existing_results()
-            logger.info(f"加载了 {len(existing_results)} 个现有结果")
+        total_batches = (total_rows + batch_size - 1) // batch_size
+        batches = self.iter_data_batches(parquet, batch_size, start_from_batch)
         
-        all_results = []
-        total_batches = (len(df) + batch_size - 1) // batch_size
+        # 全新运行时清空上次遗留的批次分片与失败项目记录；恢复时加载去重索引，跳过已完成的项目
+        failed_items_file = f"{self.temp_dir}/failed_items.jsonl"
+        if start_from_batch == 0:
+            self.reset_batch_shards()
+            if os.path.exists(failed_items_file):
+                os.remove(failed_items_file)
+        else:
+            self.completed_keys = self.load_completed_keys()
+            if self.completed_keys:
+                logger.info(f"发现 {len(self.completed_keys)} 个已完成项目，恢复时将跳过")
         
-        # 分批处理
-        for batch_num in range(start_from_batch, total_batches):
-            start_idx = batch_num * batch_size
-            end_idx = min((batch_num + 1) * batch_size, len(df))
-            
-            batch_data = df.iloc[start_idx:end_idx].copy()
-            
-            logger.info(f"处理批次 {batch_num + 1}/{total_batches} (行 {start_idx}-{end_idx})")
-            
-            batch_results = self.process_batch(batch_data, batch_num)
-            
-            if batch_results:
-                self.save_batch_results(batch_results, batch_num)
-                all_results.extend(batch_results)
-            
-            # 保存检查点
-            checkpoint = {
-                'last_completed_batch': batch_num,
-                'total_completed': len(all_results),
-                'failed_items': self.failed_items,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            with open(f"{self.temp_dir}/checkpoint.json", 'w', encoding='utf-8') as f:
-                json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        # 明细结果按批次追加写入，内存中只保留摘要统计
+        try:
+            with self.open_final_results_file(start_from_batch, batch_size) as self.final_results_file:
+                if self.use_batch_api:
+                    await self.process_batches_via_batch_api(batches, start_from_batch, total_batches)
+                else:
+                    await self.process_batches_pipelined(batches, start_from_batch, total_batches)
+        except CircuitOpenError as e:
+            logger.error(str(e))
+            return {"error": str(e)}
+        finally:
+            self.final_results_file = None
         
         # 汇总结果
-        summary = self.generate_summary(all_results)
+        summary = self.summary_accumulator.to_summary(self.enable_mislabel_analysis)
+        total_processed = self.summary_accumulator.total
 
-        # 文章级别规律提炼
+        # 文章级别规律提炼（流式读取明细文件）
         article_summaries = {}
         if self.enable_article_summary:
-            article_summaries = self.generate_article_level_summaries(all_results)
+            article_summaries = await self.generate_article_level_summaries(iter_jsonl(FINAL_RESULTS_JSONL_FILE))
         
-        # 保存最终结果
+        # 保存最终结果（明细见detailed_results_file）
         final_results = {
             'summary': summary,
-            'detailed_results': all_results,
+            'detailed_results_file': FINAL_RESULTS_JSONL_FILE,
             'article_summaries': article_summaries,
             'failed_items': self.failed_items,
             'metadata': {
-                'total_processed': len(all_results),
+                'total_processed': total_processed,
                 'total_failed': len(self.failed_items),
                 'processing_time': datetime.now().isoformat(),
                 'batch_size': batch_size
             }
         }
         
-        with open('final_analysis_results.json', 'w', encoding='utf-8') as f:
-            json.dump(final_results, f, ensure_ascii=False, indent=2)
+        with open(FINAL_SUMMARY_FILE, 'wb') as f:
+            f.write(orjson.dumps(final_results, option=JSON_FILE_OPTIONS))
         
-        logger.info(f"分析完成！总计处理 {len(all_results)} 项，失败 {len(self.failed_items)} 项")
+        logger.info(f"分析完成！总计处理 {total_processed} 项，失败 {len(self.failed_items)} 项")
         
         return final_results
 
@@ -411,7 +1238,7 @@ C) None - 不是数据集引用或不相关
         """
         创建文章级别的规律提炼提示词
         """
-        items_json = json.dumps(items, ensure_ascii=False, indent=2)
+        items_json = orjson.dumps(items, option=JSON_FILE_OPTIONS).decode('utf-8')
         prompt = f"""
 你是一名数据标注与信息抽取专家。请基于同一篇文章(article_id={article_id})的多条数据集分类分析结果，进行“提炼但不损失细节”的两层总结：
 
@@ -440,7 +1267,7 @@ C) None - 不是数据集引用或不相关
 """
         return prompt
 
-    def generate_article_level_summaries(self, results: List[Dict]) -> Dict[str, Dict]:
+    async def generate_article_level_summaries(self, results: Iterable[Dict]) -> Dict[str, Dict]:
         """
         生成按文章聚合的规律提炼
         返回: article_id -> summary dict
@@ -465,8 +1292,7 @@ C) None - 不是数据集引用或不相关
             article_to_items.setdefault(str(article_id), []).append(item)
 
         # 逐文章汇总
-        article_summaries: Dict[str, Dict] = {}
-        for article_id, items in article_to_items.items():
+        async def summarize_article(article_id: str, items: List[Dict]) -> Dict:
             # 控制输入大小：截断过长字段与数量
             compact_items: List[Dict] = []
             for it in items[:100]:
@@ -478,14 +1304,17 @@ C) None - 不是数据集引用或不相关
                     'supporting_keywords': list(it.get('supporting_keywords', []))[:20]
                 })
             prompt = self.create_article_summary_prompt(article_id, compact_items)
-            summary = self.call_api_with_retry(prompt, f"article_{article_id}")
+            try:
+                summary = await self.call_api_with_retry(prompt, f"article_{article_id}")
+            except CircuitOpenError:
+                summary = None
             if not summary or 'error' in summary:
                 # 退化：不经LLM，做简单统计
                 type_to_patterns: Dict[str, List[str]] = {}
                 for it in compact_items:
                     t = it.get('classification') or 'unknown'
                     type_to_patterns.setdefault(t, []).append(it.get('context_pattern') or '')
-                article_summaries[article_id] = {
+                return {
                     'article_id': article_id,
                     'refined_rules_paragraph': '提炼失败(回退)：按类型汇总上下文规律，供参考。',
                     'common_patterns': [],
@@ -493,97 +1322,76 @@ C) None - 不是数据集引用或不相关
                     'supporting_keywords_top': [],
                     'source_patterns': compact_items
                 }
-            else:
-                article_summaries[article_id] = summary
+            return summary
+
+        summaries = await asyncio.gather(
+            *(summarize_article(article_id, items) for article_id, items in article_to_items.items())
+        )
+        article_summaries: Dict[str, Dict] = dict(zip(article_to_items.keys(), summaries))
 
         # 单独保存文件
         try:
-            with open(os.path.join(self.temp_dir, 'article_summaries.json'), 'w', encoding='utf-8') as f:
-                json.dump(article_summaries, f, ensure_ascii=False, indent=2)
+            with open(os.path.join(self.temp_dir, 'article_summaries.json'), 'wb') as f:
+                f.write(orjson.dumps(article_summaries, option=JSON_FILE_OPTIONS))
         except Exception as e:
             logger.error(f"保存文章级别规律文件失败: {e}")
 
         return article_summaries
 
-    # === 解耦式：从已存在的final_analysis_results.json生成文章级归纳 ===
+    # === 解耦式：从已存在的最终结果文件生成文章级归纳 ===
     def summarize_articles_from_file(self, input_file: str, output_file: Optional[str] = None) -> Dict[str, Dict]:
         """
         基于已完成的最终结果文件进行文章级别规律归纳，并将结果写入TEMP_DIR下的文件。
+        input_file可以是final_analysis_summary.json（经detailed_results_file读取明细）、
+        明细JSONL文件，或包含detailed_results数组的旧版结果文件。
         """
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if input_file.endswith('.jsonl'):
+                results_file = input_file
+            else:
+                with open(input_file, 'rb') as f:
+                    data = orjson.loads(f.read())
+                results_file = data.get('detailed_results_file')
+            
+            if results_file:
+                if not os.path.exists(results_file):
+                    return {"error": f"明细结果文件不存在: {results_file}"}
+                results = iter_jsonl(results_file)
+                logger.info(f"开始基于现有结果进行文章级归纳，明细文件: {results_file}")
+            else:
+                results = data.get('detailed_results', [])
+                if not isinstance(results, list) or not results:
+                    return {"error": "输入文件中未找到detailed_results或为空"}
+                logger.info(f"开始基于现有结果进行文章级归纳，共 {len(results)} 条分析结果")
         except Exception as e:
             logger.error(f"读取输入文件失败: {e}")
             return {"error": f"读取输入文件失败: {e}"}
 
-        results = data.get('detailed_results', [])
-        if not isinstance(results, list) or not results:
-            return {"error": "输入文件中未找到detailed_results或为空"}
-
-        logger.info(f"开始基于现有结果进行文章级归纳，共 {len(results)} 条分析结果")
+        async def run_summaries():
+            async with self.http_session():
+                return await self.generate_article_level_summaries(results)
 
-        article_summaries = self.generate_article_level_summaries(results)
+        article_summaries = asyncio.run(run_summaries())
 
         # 输出路径
         out_path = os.path.join(self.temp_dir, output_file) if output_file else os.path.join(self.temp_dir, 'article_summaries.json')
         try:
-            with open(out_path, 'w', encoding='utf-8') as f:
-                json.dump(article_summaries, f, ensure_ascii=False, indent=2)
+            with open(out_path, 'wb') as f:
+                f.write(orjson.dumps(article_summaries, option=JSON_FILE_OPTIONS))
             logger.info(f"文章级归纳已保存到: {out_path}")
         except Exception as e:
             logger.error(f"保存文章级归纳失败: {e}")
 
         return article_summaries
     
-    def generate_summary(self, results: List[Dict]) -> Dict:
+    def generate_summary(self, results: Iterable[Dict]) -> Dict:
         """
         生成分析摘要
         """
-        if not results:
-            return {"error": "没有有效结果"}
-        
-        # 统计分类分布
-        classification_dist = {}
-        pattern_analysis = {}
-        keyword_frequency = {}
-        
+        accumulator = SummaryAccumulator()
         for result in results:
-            if 'error' not in result:
-                # 分类分布
-                orig_class = result.get('original_classification', 'unknown')
-                classification_dist[orig_class] = classification_dist.get(orig_class, 0) + 1
-                
-                # 上下文规律
-                pattern = result.get('context_pattern', '')
-                if pattern:
-                    pattern_analysis[orig_class] = pattern_analysis.get(orig_class, [])
-                    pattern_analysis[orig_class].append(pattern)
-                
-                # 关键词频率
-                keywords = result.get('supporting_keywords', [])
-                for keyword in keywords:
-                    keyword_frequency[keyword] = keyword_frequency.get(keyword, 0) + 1
-        
-        # 生成摘要
-        summary = {
-            'classification_distribution': classification_dist,
-            'top_keywords': dict(sorted(keyword_frequency.items(), 
-                                      key=lambda x: x[1], reverse=True)[:20]),
-            'context_patterns_by_type': pattern_analysis
-        }
-        if self.enable_mislabel_analysis:
-            summary['accuracy_analysis'] = {
-                'total_analyzed': len([r for r in results if 'error' not in r]),
-                'correct_classifications': len([r for r in results 
-                                              if 'error' not in r and 
-                                              r.get('is_correct_classification', True)]),
-                'incorrect_classifications': len([r for r in results 
-                                                if 'error' not in r and 
-                                                not r.get('is_correct_classification', True)])
-            }
-        
-        return summary
+            accumulator.add(result)
+        return accumulator.to_summary(self.enable_mislabel_analysis)
 
 def main():
     """
@@ -592,7 +1400,7 @@ def main():
     # 配置参数
     API_KEY = ""  # 请填写您的API密钥
     PARQUET_FILE = "your_dataset.parquet"  # 请填写您的parquet文件路径
-    MAX_WORKERS = 5  # 并发线程数
+    MAX_WORKERS = 50  # 最大并发请求数
     BATCH_SIZE = 50  # 每批处理的数据量
     
     if not API_KEY:
@@ -28,8 +28,10 @@ def main():
         return False
     
     print(f"📁 数据集文件: {PARQUET_FILE_PATH}")
-    print(f"🔧 配置: {MAX_WORKERS} 个并发线程, 批次大小 {BATCH_SIZE}, 推理温度 {TEMPERATURE}, 最大输出长度 {MAX_TOKENS}, 存储目录 {TEMP_DIR}")
+    print(f"🔧 配置: {MAX_WORKERS} 个并发请求, 批次大小 {BATCH_SIZE}, 推理温度 {TEMPERATURE}, 最大输出长度 {MAX_TOKENS}, 存储目录 {TEMP_DIR}")
     print(f"🔄 最大重试次数: {MAX_RETRIES}")
+    if USE_BATCH_API:
+        print(f"📦 使用Batch API提交, 最多 {MAX_BATCH_JOBS} 个任务同时在途, 轮询间隔 {BATCH_POLL_INTERVAL} 秒")
     
     # 询问是否继续
     confirm = input("\n是否开始分析? (y/N): ").strip().lower()
@@ -46,7 +48,12 @@ def main():
         max_len=MAX_TOKENS,
         output=TEMP_DIR,
         enable_mislabel_analysis=ENABLE_MISLABEL_ANALYSIS,
-        enable_article_summary=ENABLE_ARTICLE_SUMMARY
+        enable_article_summary=ENABLE_ARTICLE_SUMMARY,
+        use_batch_api=USE_BATCH_API,
+        batch_poll_interval=BATCH_POLL_INTERVAL,
+        max_batch_jobs=MAX_BATCH_JOBS,
+        max_rpm=MAX_RPM,
+        max_tpm=MAX_TPM
     )
     
     try:
@@ -93,7 +100,8 @@ def main():
             for i, (keyword, freq) in enumerate(list(summary['top_keywords'].items())[:10], 1):
                 print(f"  {i}. {keyword}: {freq}")
         
-        print(f"\n💾 详细结果已保存到: {FINAL_RESULTS_FILE}")
+        print(f"\n💾 结果摘要已保存到: {FINAL_RESULTS_FILE}")
+        print(f"📄 详细结果已保存到: {results['detailed_results_file']}")
         print(f"📁 中间结果目录: {TEMP_DIR}")
         print(f"📝 日志文件: {LOG_FILE}")
         